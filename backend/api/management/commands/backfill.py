@@ -0,0 +1,54 @@
+import time
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.backfill import BackfillService, HistoryStore
+from api.services.market_data import market_data_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill historical OHLCV candles into the local history store. "
+        "Re-running the same command resumes where the last run stopped and fills gaps."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='+', help="e.g. BTC/USDT ETH/USDT, or EUR/USD for --source forex")
+        parser.add_argument('--source', default='binance',
+                            choices=list(market_data_service.exchanges) + ['forex', 'stock'])
+        parser.add_argument('--timeframe', default='1h', help="e.g. 1m, 15m, 1h, 1d")
+        parser.add_argument('--start', required=True, help="Start date (ISO 8601), e.g. 2020-01-01")
+        parser.add_argument('--end', default=None, help="End date (ISO 8601), defaults to now")
+        parser.add_argument('--workers', type=int, default=4, help="Symbols fetched concurrently")
+        parser.add_argument('--out', default=None, help="Store directory, defaults to settings.HISTORY_DIR")
+
+    def handle(self, *args, **options):
+        try:
+            start_ms = int(pd.Timestamp(options['start'], tz='UTC').timestamp() * 1000)
+            end_ms = int(pd.Timestamp(options['end'], tz='UTC').timestamp() * 1000) if options['end'] else int(time.time() * 1000)
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+        if start_ms >= end_ms:
+            raise CommandError("--start must be before --end")
+
+        store = HistoryStore(options['out'] or settings.HISTORY_DIR)
+        service = BackfillService(store)
+
+        failed = 0
+        results = service.run(options['source'], options['symbols'], options['timeframe'],
+                              start_ms, end_ms, workers=options['workers'])
+        for symbol, summary, error in results:
+            if error is not None:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"{symbol}: {error}"))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f"{symbol}: fetched {summary['fetched']} candles, {summary['stored']} stored, "
+                f"{summary['filled_ranges']} ranges filled, {summary['remaining_gaps']} gaps left "
+                f"-> {summary['path']}"
+            ))
+
+        if failed:
+            raise CommandError(f"{failed} of {len(options['symbols'])} symbols failed; re-run to resume")
@@ -0,0 +1,132 @@
+import itertools
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Request mix modelled on the dashboard's polling
+SCENARIOS = [
+    ('/api/market-analysis/', {'symbol': 'BTC/USDT', 'type': 'crypto', 'timeframe': '1h'}),
+    ('/api/market-analysis/', {'symbol': 'ETH/USDT', 'type': 'crypto', 'timeframe': '1h'}),
+    ('/api/market-analysis/', {'symbol': 'SOL/USDT', 'type': 'crypto', 'timeframe': '15m'}),
+    ('/api/forex-prediction/', {'pair': 'EUR/USD', 'timeframe': '1h'}),
+    ('/api/forex-prediction/', {'pair': 'GBP/USD', 'timeframe': '1h'}),
+    ('/api/forex-prediction/', {'pair': 'USD/JPY', 'timeframe': '1d'}),
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive /api/market-analysis/ and /api/forex-prediction/ at a target rate and report "
+        "throughput and latency percentiles. Run the server with MARKET_DATA_BACKEND=fake "
+        "to load-test without network access."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Base URL of the running server")
+        parser.add_argument('--rps', type=float, default=20, help="Target requests per second")
+        parser.add_argument('--duration', type=float, default=30, help="Test length in seconds")
+        parser.add_argument('--concurrency', type=int, default=64, help="Max requests in flight")
+        parser.add_argument('--timeout', type=float, default=30, help="Per-request timeout in seconds")
+        parser.add_argument('--endpoint', choices=['all', 'market', 'forex'], default='all')
+        parser.add_argument('--conditional', action='store_true',
+                            help="Send If-None-Match with the last ETag seen per URL, like a polling browser")
+
+    def handle(self, *args, **options):
+        if options['rps'] <= 0 or options['duration'] <= 0:
+            raise CommandError("--rps and --duration must be positive")
+
+        scenarios = [
+            (path, params) for path, params in SCENARIOS
+            if options['endpoint'] == 'all' or options['endpoint'] in path
+        ]
+        urls = [f"{options['url'].rstrip('/')}{path}?{urlencode(params)}" for path, params in scenarios]
+
+        self.timeout = options['timeout']
+        self.conditional = options['conditional']
+        self.etags = {}
+        self.latencies = []
+        self.statuses = Counter()
+        self.lock = threading.Lock()
+
+        total = int(options['rps'] * options['duration'])
+        interval = 1 / options['rps']
+        self.stdout.write(f"Sending {total} requests at {options['rps']} rps to {options['url']} ...")
+
+        # Open loop: requests are scheduled at a fixed rate regardless of how fast
+        # the server answers, and latency is measured from the scheduled time so
+        # queueing behind a slow server shows up in the percentiles.
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for i, url in zip(range(total), itertools.cycle(urls)):
+                scheduled = started + i * interval
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self._request, url, scheduled)
+        elapsed = time.monotonic() - started
+
+        self._report(total, elapsed)
+
+    def _request(self, url, scheduled):
+        request = urllib.request.Request(url)
+        if self.conditional:
+            with self.lock:
+                etag = self.etags.get(url)
+            if etag:
+                request.add_header('If-None-Match', etag)
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                status = response.status
+                etag = response.headers.get('ETag')
+        except urllib.error.HTTPError as e:
+            status = e.code
+            etag = e.headers.get('ETag')
+        except Exception as e:
+            status = type(e).__name__
+            etag = None
+
+        latency = time.monotonic() - scheduled
+        with self.lock:
+            self.latencies.append(latency)
+            self.statuses[status] += 1
+            if etag:
+                self.etags[url] = etag
+
+    def _report(self, total, elapsed):
+        latencies = sorted(self.latencies)
+        ok = sum(count for status, count in self.statuses.items() if status in (200, 304))
+
+        self.stdout.write("")
+        self.stdout.write(f"Requests:    {total} in {elapsed:.1f}s")
+        self.stdout.write(f"Throughput:  {len(latencies) / elapsed:.1f} req/s ({ok / elapsed:.1f} successful)")
+        self.stdout.write("Latency:     p50 {:.1f} ms | p90 {:.1f} ms | p99 {:.1f} ms | max {:.1f} ms".format(
+            percentile(latencies, 50) * 1000,
+            percentile(latencies, 90) * 1000,
+            percentile(latencies, 99) * 1000,
+            (latencies[-1] if latencies else 0) * 1000,
+        ))
+        self.stdout.write("Status:      " + ", ".join(
+            f"{status}: {count}" for status, count in sorted(self.statuses.items(), key=lambda item: str(item[0]))
+        ))
+
+        if ok < total:
+            self.stdout.write(self.style.WARNING(f"{total - ok} requests failed"))
+        else:
+            self.stdout.write(self.style.SUCCESS("All requests succeeded"))
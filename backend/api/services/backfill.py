@@ -0,0 +1,313 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+
+import ccxt
+import pandas as pd
+
+from .market_data import market_data_service, to_yahoo_forex_symbol
+
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+# Max candles per fetch_ohlcv call; exchanges not listed get a conservative default
+PAGE_LIMITS = {
+    'binance': 1000,
+    'coinbase': 300,
+}
+
+# Yahoo only serves intraday history for a limited window and caps the span of
+# a single request: timeframe -> (max days per request, max days of lookback)
+YAHOO_LIMITS = {
+    '1m': (7, 29),
+    '5m': (59, 59),
+    '15m': (59, 59),
+    '30m': (59, 59),
+    '1h': (180, 729),
+    '1d': (3650, None),
+}
+
+# Minimum seconds between Yahoo requests, shared by all workers
+YAHOO_MIN_INTERVAL = 0.5
+
+MAX_RETRIES = 5
+
+
+def to_ms(timestamps):
+    """Convert a datetime column to UTC epoch milliseconds (naive values are assumed UTC)"""
+    timestamps = pd.to_datetime(timestamps, utc=True)
+    return (timestamps - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(milliseconds=1)
+
+
+def timeframe_ms(timeframe: str) -> int:
+    return int(ccxt.Exchange.parse_timeframe(timeframe) * 1000)
+
+
+class RateLimiter:
+    """Spaces out requests to one upstream across all worker threads"""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class HistoryStore:
+    """
+    Local candle store with one CSV per series:
+    <root>/<source>/<timeframe>/<symbol>.csv
+
+    Timestamps are UTC epoch milliseconds. Pages are appended as they arrive
+    and a sidecar checkpoint records how many bytes of the file are complete,
+    so a run that is interrupted mid-write resumes from the last good page.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, source: str, symbol: str, timeframe: str) -> Path:
+        name = symbol.replace('/', '_').replace('=', '_')
+        return self.root / source / timeframe / f"{name}.csv"
+
+    def _checkpoint_path(self, path: Path) -> Path:
+        return path.with_suffix('.checkpoint.json')
+
+    def checkpoint(self, path: Path):
+        checkpoint_path = self._checkpoint_path(path)
+        if not checkpoint_path.exists():
+            return None
+        return json.loads(checkpoint_path.read_text())
+
+    def _write_checkpoint(self, path: Path, last_timestamp):
+        checkpoint_path = self._checkpoint_path(path)
+        tmp = checkpoint_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({
+            'bytes': path.stat().st_size,
+            'last_timestamp': last_timestamp,
+        }))
+        os.replace(tmp, checkpoint_path)
+
+    def append(self, path: Path, df: pd.DataFrame):
+        if df.empty:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        df[COLUMNS].to_csv(path, mode='a', header=not path.exists(), index=False)
+
+        checkpoint = self.checkpoint(path) or {}
+        last_timestamp = int(df['timestamp'].max())
+        if checkpoint.get('last_timestamp') is not None:
+            last_timestamp = max(last_timestamp, checkpoint['last_timestamp'])
+        self._write_checkpoint(path, last_timestamp)
+
+    def load(self, path: Path) -> pd.DataFrame:
+        if not path.exists():
+            return pd.DataFrame(columns=COLUMNS)
+
+        # Drop anything written after the last completed append
+        checkpoint = self.checkpoint(path)
+        if checkpoint is not None and path.stat().st_size > checkpoint['bytes']:
+            with open(path, 'r+b') as f:
+                f.truncate(checkpoint['bytes'])
+
+        df = pd.read_csv(path).dropna()
+        df['timestamp'] = df['timestamp'].astype('int64')
+        return df
+
+    def compact(self, path: Path) -> pd.DataFrame:
+        """Sort and de-duplicate a series in place, returning the result"""
+        df = self.load(path)
+        if df.empty:
+            return df
+
+        df = df.drop_duplicates('timestamp', keep='last').sort_values('timestamp').reset_index(drop=True)
+        tmp = path.with_suffix('.csv.tmp')
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, path)
+        self._write_checkpoint(path, int(df['timestamp'].iloc[-1]))
+        return df
+
+    @staticmethod
+    def missing_ranges(df: pd.DataFrame, start_ms: int, end_ms: int, step_ms: int, include_gaps: bool = True):
+        """
+        Return the (first, last) millisecond ranges inside [start_ms, end_ms]
+        that are not covered by `df`: the head before the first stored
+        candle, holes between candles, and the tail after the last one.
+        """
+        df = df[(df['timestamp'] >= start_ms) & (df['timestamp'] <= end_ms)]
+        if df.empty:
+            return [(start_ms, end_ms)]
+
+        timestamps = df['timestamp'].reset_index(drop=True)
+        ranges = []
+        if timestamps.iloc[0] - start_ms >= step_ms:
+            ranges.append((start_ms, int(timestamps.iloc[0]) - step_ms))
+        if include_gaps:
+            diffs = timestamps.diff()
+            for i in diffs[diffs > step_ms].index:
+                ranges.append((int(timestamps[i - 1]) + step_ms, int(timestamps[i]) - step_ms))
+        if end_ms - timestamps.iloc[-1] >= step_ms:
+            ranges.append((int(timestamps.iloc[-1]) + step_ms, end_ms))
+        return ranges
+
+
+class BackfillService:
+    """
+    Pull deep OHLCV history into a HistoryStore.
+
+    ccxt sources are paged with fetch_ohlcv(since=...), Yahoo sources
+    (forex, stock) are fetched in date-range chunks. Symbols are processed
+    concurrently while every request to the same upstream goes through one
+    shared RateLimiter.
+    """
+
+    def __init__(self, store: HistoryStore, exchanges=None, yahoo=None):
+        self.store = store
+        self.exchanges = exchanges if exchanges is not None else market_data_service.exchanges
+        self.yahoo = yahoo if yahoo is not None else market_data_service.yahoo
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+
+    def _limiter(self, source: str) -> RateLimiter:
+        with self._limiters_lock:
+            if source not in self._limiters:
+                exchange = self.exchanges.get(source)
+                interval = exchange.rateLimit / 1000 if exchange else YAHOO_MIN_INTERVAL
+                self._limiters[source] = RateLimiter(interval)
+            return self._limiters[source]
+
+    def _call(self, source: str, retry_on, fn, *args, **kwargs):
+        """Rate-limited call with exponential backoff on transient errors"""
+        for attempt in range(MAX_RETRIES):
+            self._limiter(source).wait()
+            try:
+                return fn(*args, **kwargs)
+            except retry_on as e:
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                delay = 2 ** attempt
+                print(f"⚠️ {source} request failed ({e}), retrying in {delay}s")
+                time.sleep(delay)
+
+    def _fetch_ccxt_range(self, source, path, symbol, timeframe, first_ms, last_ms):
+        exchange = self.exchanges[source]
+        step = timeframe_ms(timeframe)
+        limit = PAGE_LIMITS.get(source, 500)
+        rows = 0
+        since = first_ms
+
+        while since <= last_ms:
+            ohlcv = self._call(source, ccxt.NetworkError, exchange.fetch_ohlcv,
+                               symbol, timeframe, since=since, limit=limit)
+            page = pd.DataFrame(ohlcv, columns=COLUMNS)
+            page = page[(page['timestamp'] >= since) & (page['timestamp'] <= last_ms)]
+            if page.empty:
+                break
+            self.store.append(path, page)
+            rows += len(page)
+            since = int(page['timestamp'].iloc[-1]) + step
+
+        return rows
+
+    def _fetch_yahoo_range(self, path, yahoo_symbol, timeframe, first_ms, last_ms):
+        chunk_days, _ = YAHOO_LIMITS[timeframe]
+        chunk_ms = chunk_days * DAY_MS
+        rows = 0
+
+        for chunk_start in range(first_ms, last_ms + 1, chunk_ms):
+            chunk_end = min(chunk_start + chunk_ms, last_ms + 1)
+            df = self._call('yahoo', Exception, self.yahoo.Ticker(yahoo_symbol).history,
+                            start=datetime.fromtimestamp(chunk_start / 1000, tz=timezone.utc),
+                            end=datetime.fromtimestamp(chunk_end / 1000, tz=timezone.utc),
+                            interval=timeframe)
+            if df.empty:
+                continue
+
+            df.reset_index(inplace=True)
+            # Standardize columns
+            df.rename(columns={'Date': 'timestamp', 'Datetime': 'timestamp', 'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close', 'Volume': 'volume'}, inplace=True)
+            df['timestamp'] = to_ms(df['timestamp'])
+            self.store.append(path, df)
+            rows += len(df)
+            print(f"📥 {yahoo_symbol}: {rows} candles up to {df['timestamp'].iloc[-1]}")
+
+        return rows
+
+    def backfill(self, source: str, symbol: str, timeframe: str, start_ms: int, end_ms: int):
+        """
+        Backfill one series and return a summary dict.
+        Already stored candles are skipped, so re-running resumes the series.
+        """
+        step = timeframe_ms(timeframe)
+        # The newest bar is still open and would be stored with a partial close,
+        # so stop at the last closed bar
+        end_ms = min(end_ms, int(time.time() * 1000) // step * step - step)
+        path = self.store.path(source, symbol, timeframe)
+        is_exchange = source in self.exchanges
+
+        if is_exchange:
+            fetch_range = lambda first, last: self._fetch_ccxt_range(source, path, symbol, timeframe, first, last)
+        elif source in ('forex', 'stock'):
+            if timeframe not in YAHOO_LIMITS:
+                raise ValueError(f"Timeframe {timeframe} not supported for Yahoo backfill")
+            _, lookback_days = YAHOO_LIMITS[timeframe]
+            if lookback_days is not None:
+                start_ms = max(start_ms, int(time.time() * 1000) - lookback_days * DAY_MS)
+            yahoo_symbol = to_yahoo_forex_symbol(symbol) if source == 'forex' else symbol
+            fetch_range = lambda first, last: self._fetch_yahoo_range(path, yahoo_symbol, timeframe, first, last)
+        else:
+            raise ValueError(f"Source {source} not supported")
+
+        # Exchanges trade around the clock, so holes between candles are real gaps.
+        # Yahoo series have overnight and weekend closures, so only head/tail are filled.
+        existing = self.store.compact(path)
+        # Always refetch the last stored bar, in case it was written before it closed
+        if not existing.empty:
+            existing = existing.iloc[:-1]
+        ranges = self.store.missing_ranges(existing, start_ms, end_ms, step, include_gaps=is_exchange)
+
+        rows = 0
+        for first, last in ranges:
+            rows += fetch_range(first, last)
+
+        stored = self.store.compact(path)
+        remaining_gaps = []
+        if is_exchange and not stored.empty:
+            remaining_gaps = self.store.missing_ranges(stored, int(stored['timestamp'].iloc[0]), int(stored['timestamp'].iloc[-1]), step)
+
+        return {
+            'path': str(path),
+            'fetched': rows,
+            'stored': len(stored),
+            'filled_ranges': len(ranges),
+            'remaining_gaps': len(remaining_gaps),
+        }
+
+    def run(self, source: str, symbols, timeframe: str, start_ms: int, end_ms: int, workers: int = 4):
+        """
+        Backfill several symbols concurrently.
+        Yields (symbol, summary, error) as each series finishes.
+        """
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(self.backfill, source, symbol, timeframe, start_ms, end_ms): symbol
+                for symbol in symbols
+            }
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    yield symbol, future.result(), None
+                except Exception as e:
+                    yield symbol, None, e
@@ -0,0 +1,185 @@
+"""
+In-process stand-ins for ccxt exchanges and yfinance, used with
+MARKET_DATA_BACKEND=fake to run and load-test the API without network.
+
+Candles are a deterministic function of (symbol, candle open time), so
+repeated requests see the same history and a new bar appears only when
+one closes, just like a real upstream. Latency, random errors and a
+per-source rate limit are configurable.
+"""
+import random
+import threading
+import time
+import zlib
+from collections import deque
+
+import ccxt
+import numpy as np
+import pandas as pd
+from yfinance.exceptions import YFRateLimitError
+
+BASE_PRICES = {
+    'BTC/USDT': 45000,
+    'ETH/USDT': 2500,
+    'SOL/USDT': 100,
+    'EURUSD=X': 1.0850,
+    'GBPUSD=X': 1.2650,
+    'USDJPY=X': 148.50,
+    'AUDUSD=X': 0.6550,
+    'USDCAD=X': 1.3450,
+    'USDCHF=X': 0.8750,
+}
+
+# yfinance period strings -> days of history
+YAHOO_PERIODS = {
+    '1d': 1, '5d': 5, '1mo': 30, '3mo': 90, '6mo': 180,
+    '1y': 365, '2y': 730, '5y': 1825, '10y': 3650, 'max': 3650,
+}
+
+# yfinance interval strings -> candle length
+YAHOO_INTERVALS = {
+    '1m': '1min', '2m': '2min', '5m': '5min', '15m': '15min', '30m': '30min',
+    '60m': '1h', '90m': '90min', '1h': '1h', '1d': '1D', '5d': '5D', '1wk': '7D', '1mo': '30D',
+}
+
+
+def fake_candles(symbol: str, open_times_ms: np.ndarray) -> pd.DataFrame:
+    """Deterministic OHLCV rows for the given candle open times"""
+    base = BASE_PRICES.get(symbol, 100.0)
+    seed = zlib.crc32(symbol.encode()) % 1000
+    # Phase advances per hour so every timeframe sees the same underlying curve
+    phase = open_times_ms / 3_600_000 * 0.05 + seed
+
+    def price(p):
+        return base * (1 + 0.03 * np.sin(p) + 0.01 * np.sin(p * 3.7 + 1.3) + 0.004 * np.sin(p * 17.3))
+
+    open_ = price(phase)
+    close = price(phase + 0.05)
+    wick = 0.002 * (1.5 + np.sin(phase * 7.1))
+    return pd.DataFrame({
+        'timestamp': open_times_ms.astype('int64'),
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + wick),
+        'low': np.minimum(open_, close) * (1 - wick),
+        'close': close,
+        'volume': 1000 * (2 + np.sin(phase * 5.3)),
+    })
+
+
+def _utc(value) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    return ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+
+
+class UpstreamSimulator:
+    """Latency, random failures and a sliding-window rate limit for one fake source"""
+
+    def __init__(self, name: str, latency_ms: float = 50, error_rate: float = 0.0, rate_limit: float = 0):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit  # requests per second, 0 disables
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def request(self, rate_limited_error, failure_error):
+        if self.rate_limit:
+            with self._lock:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rate_limit:
+                    raise rate_limited_error(f"{self.name} 429 Too Many Requests (fake)")
+                self._recent.append(now)
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000 * random.uniform(0.5, 1.5))
+
+        if self.error_rate and random.random() < self.error_rate:
+            raise failure_error(f"{self.name} simulated upstream failure (fake)")
+
+
+class FakeExchange:
+    """Honours the parts of the ccxt exchange API that this app uses"""
+
+    max_limit = 1000
+
+    def __init__(self, exchange_id: str, latency_ms: float = 50, error_rate: float = 0.0, rate_limit: float = 0):
+        self.id = exchange_id
+        self.simulator = UpstreamSimulator(exchange_id, latency_ms, error_rate, rate_limit)
+        # ccxt exposes the minimum delay between requests in milliseconds
+        self.rateLimit = 1000 / rate_limit if rate_limit else 50
+
+    @staticmethod
+    def parse_timeframe(timeframe: str) -> int:
+        return ccxt.Exchange.parse_timeframe(timeframe)
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '1m', since=None, limit=None, params={}):
+        self.simulator.request(ccxt.RateLimitExceeded, ccxt.ExchangeNotAvailable)
+        if symbol not in BASE_PRICES or '/' not in symbol:
+            raise ccxt.BadSymbol(f"{self.id} does not have market symbol {symbol} (fake)")
+
+        step = self.parse_timeframe(timeframe) * 1000
+        limit = min(limit or 500, self.max_limit)
+        # The last candle is the one currently forming, as on a real exchange
+        last_open = int(time.time() * 1000) // step * step
+        if since is None:
+            first_open = last_open - (limit - 1) * step
+        else:
+            first_open = -(-since // step) * step
+        if first_open > last_open:
+            return []
+
+        count = min(limit, (last_open - first_open) // step + 1)
+        open_times = first_open + np.arange(count, dtype='int64') * step
+        candles = fake_candles(symbol, open_times)
+        return [[int(t), o, h, l, c, v] for t, o, h, l, c, v in candles.itertuples(index=False)]
+
+
+class FakeTicker:
+    def __init__(self, yahoo: 'FakeYahoo', symbol: str):
+        self.yahoo = yahoo
+        self.ticker = symbol
+
+    def history(self, period: str = '1mo', interval: str = '1d', start=None, end=None, **kwargs):
+        """Return a frame shaped like yfinance's Ticker.history"""
+        self.yahoo.simulator.request(lambda message: YFRateLimitError(), ConnectionError)
+
+        step = pd.Timedelta(YAHOO_INTERVALS.get(interval, '1D'))
+        end = _utc(end) if end is not None else pd.Timestamp.now(tz='UTC')
+        if start is not None:
+            start = _utc(start)
+        else:
+            start = end - pd.Timedelta(days=YAHOO_PERIODS.get(period, 30))
+
+        index = pd.date_range(start.ceil(step), end, freq=step, inclusive='left')
+        # Forex and equities don't trade at weekends
+        index = index[index.dayofweek < 5]
+        index.name = 'Date' if step >= pd.Timedelta(days=1) else 'Datetime'
+        # Like Yahoo, an unknown currency pair just comes back empty
+        if self.ticker.endswith('=X') and self.ticker not in BASE_PRICES:
+            index = index[:0]
+        if index.empty:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'], index=index)
+
+        open_times_ms = (index - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(milliseconds=1)
+        candles = fake_candles(self.ticker, np.asarray(open_times_ms))
+        return pd.DataFrame({
+            'Open': candles['open'].values,
+            'High': candles['high'].values,
+            'Low': candles['low'].values,
+            'Close': candles['close'].values,
+            'Volume': candles['volume'].values,
+            'Dividends': 0.0,
+            'Stock Splits': 0.0,
+        }, index=index)
+
+
+class FakeYahoo:
+    """Drop-in for the `yfinance` module: FakeYahoo().Ticker(symbol).history(...)"""
+
+    def __init__(self, latency_ms: float = 50, error_rate: float = 0.0, rate_limit: float = 0):
+        self.simulator = UpstreamSimulator('yahoo', latency_ms, error_rate, rate_limit)
+
+    def Ticker(self, symbol: str) -> FakeTicker:
+        return FakeTicker(self, symbol)
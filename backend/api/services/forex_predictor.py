@@ -1,12 +1,18 @@
 import pandas as pd
 import numpy as np
+import threading
 import warnings
+from collections import OrderedDict
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 warnings.filterwarnings('ignore')
 
 class ForexPredictor:
     def __init__(self):
         self.model = None
         self.scaler = None
+        # The model and scaler are refit per request, so concurrent requests must not share them mid-fit
+        self._lock = threading.Lock()
         
     def _ensure_model(self):
         """
@@ -79,13 +85,12 @@ class ForexPredictor:
         
         return X, y
     
-    def train_and_predict(self, df):
+    def train_and_predict(self, df, key=None):
         """
         Train model on historical data and predict next movement
         Returns: prediction (UP/DOWN), confidence (0-100)
+        `key` identifies the series; the batch model refits from scratch and ignores it.
         """
-        self._ensure_model()
-        
         X, y = self.prepare_features(df)
         
         if X is None or len(X) < 10:
@@ -97,16 +102,19 @@ class ForexPredictor:
         y_train = y.iloc[:train_size]
         X_latest = X.iloc[-1:] # Last point for prediction
         
-        # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_latest_scaled = self.scaler.transform(X_latest)
-        
-        # Train model
-        self.model.fit(X_train_scaled, y_train)
-        
-        # Predict
-        prediction = self.model.predict(X_latest_scaled)[0]
-        confidence = self.model.predict_proba(X_latest_scaled)[0]
+        with self._lock:
+            self._ensure_model()
+            
+            # Scale features
+            X_train_scaled = self.scaler.fit_transform(X_train)
+            X_latest_scaled = self.scaler.transform(X_latest)
+            
+            # Train model
+            self.model.fit(X_train_scaled, y_train)
+            
+            # Predict
+            prediction = self.model.predict(X_latest_scaled)[0]
+            confidence = self.model.predict_proba(X_latest_scaled)[0]
         
         # Get confidence for the predicted class
         predicted_confidence = confidence[prediction] * 100
@@ -115,11 +123,11 @@ class ForexPredictor:
         
         return direction, round(predicted_confidence, 2)
     
-    def get_prediction_details(self, df):
+    def get_prediction_details(self, df, key=None):
         """
         Get detailed prediction with supporting metrics
         """
-        direction, confidence = self.train_and_predict(df)
+        direction, confidence = self.train_and_predict(df, key)
         
         if direction == "INSUFFICIENT_DATA":
             return {
@@ -152,4 +160,110 @@ class ForexPredictor:
             "message": f"{signal_strength} {direction} signal with {confidence}% confidence"
         }
 
-forex_predictor = ForexPredictor()
+class OnlineForexPredictor(ForexPredictor):
+    """
+    Incremental alternative to the RandomForest refit.
+
+    Keeps one SGD logistic regression and running scaler per series and
+    updates them with partial_fit on each newly closed bar, so keeping a
+    model current costs O(features) per bar instead of a full refit.
+    Uses the same prepare_features feature set and prediction contract.
+    """
+
+    # Per-series models kept in memory; the least recently used is evicted beyond this
+    max_series = 500
+
+    def __init__(self):
+        super().__init__()
+        # key -> {'model', 'scaler', 'last_trained', 'lock'}, least recently used first
+        self._series = OrderedDict()
+
+    def _series_state(self, key, create: bool = True):
+        with self._lock:
+            state = self._series.get(key)
+            if state is not None:
+                self._series.move_to_end(key)
+            elif create:
+                # Lazy import sklearn to avoid high memory usage on startup
+                from sklearn.linear_model import SGDClassifier
+                from sklearn.preprocessing import StandardScaler
+                
+                state = {
+                    # A small, adaptive step size and stronger regularization keep the
+                    # weights bounded; the default 'optimal' schedule takes huge early
+                    # steps and saturates predict_proba at ~100% on noise
+                    'model': SGDClassifier(loss='log_loss', alpha=1e-2, learning_rate='adaptive',
+                                           eta0=1e-3, random_state=42),
+                    'scaler': StandardScaler(),
+                    'last_trained': None,
+                    'lock': threading.Lock(),
+                }
+                self._series[key] = state
+                while len(self._series) > self.max_series:
+                    self._series.popitem(last=False)
+            return state
+
+    @staticmethod
+    def labelled_timestamps(df, X):
+        """
+        Timestamps of the feature rows whose label is final.
+        A row's target compares the next bar's close with its own, and the
+        newest bar is still open, so the last two rows are left out.
+        """
+        timestamps = pd.to_datetime(df.loc[X.index, 'timestamp'], utc=True)
+        return timestamps.iloc[:-2]
+
+    def train_and_predict(self, df, key=None):
+        """
+        Update the series model with closed bars it hasn't seen and predict next movement
+        Returns: prediction (UP/DOWN), confidence (0-100)
+        """
+        X, y = self.prepare_features(df)
+        
+        if X is None or len(X) < 10:
+            return "INSUFFICIENT_DATA", 0.0
+        
+        X_latest = X.iloc[-1:]
+        # Mock candles aren't real history and stale ones come from a failing upstream,
+        # so only predict from them; never train on them
+        trainable = not df.attrs.get('mock', False) and not df.attrs.get('stale', False)
+        
+        state = self._series_state(key, create=trainable)
+        if state is None:
+            return "INSUFFICIENT_DATA", 0.0
+        
+        with state['lock']:
+            if trainable:
+                labelled = self.labelled_timestamps(df, X)
+                if state['last_trained'] is not None:
+                    labelled = labelled[labelled > state['last_trained']]
+                
+                if not labelled.empty:
+                    # First call warms up on the whole window, later calls only see new bars
+                    X_new = X.loc[labelled.index]
+                    state['scaler'].partial_fit(X_new)
+                    state['model'].partial_fit(state['scaler'].transform(X_new), y.loc[labelled.index], classes=[0, 1])
+                    state['last_trained'] = labelled.iloc[-1]
+            
+            if state['last_trained'] is None:
+                return "INSUFFICIENT_DATA", 0.0
+            
+            confidence = state['model'].predict_proba(state['scaler'].transform(X_latest))[0]
+        
+        prediction = int(confidence[1] >= 0.5)
+        predicted_confidence = confidence[prediction] * 100
+        
+        direction = "UP" if prediction == 1 else "DOWN"
+        
+        return direction, round(predicted_confidence, 2)
+
+def build_forex_predictor():
+    """Return the predictor for the configured FOREX_PREDICTOR_BACKEND"""
+    backend = getattr(settings, 'FOREX_PREDICTOR_BACKEND', 'batch')
+    if backend == 'online':
+        return OnlineForexPredictor()
+    if backend != 'batch':
+        raise ImproperlyConfigured(f"Unknown FOREX_PREDICTOR_BACKEND: {backend}")
+    return ForexPredictor()
+
+forex_predictor = build_forex_predictor()
@@ -2,10 +2,29 @@ import pandas as pd
 import numpy as np
 
 class TechnicalAnalysisService:
+    # Window sizes and ATR multipliers used by calculate_indicators. They are part
+    # of the API ETag. Column names follow them (SMA_20, MACD_12_26_9, ...), and
+    # the frontend chart reads SMA_20 and SMA_50.
+    config = {
+        'sma': (20, 50),
+        'ema': 20,
+        'rsi': 14,
+        'macd': (12, 26, 9),
+        'atr': 14,
+        'sl_atr': 2,
+        'tp_atr': 3,
+    }
+
     def calculate_indicators(self, df: pd.DataFrame):
         if df.empty:
             return df
         
+        config = self.config
+        sma_fast, sma_slow = config['sma']
+        macd_fast, macd_slow, macd_signal = config['macd']
+        sma_fast_col, sma_slow_col = f'SMA_{sma_fast}', f'SMA_{sma_slow}'
+        macd_suffix = f'{macd_fast}_{macd_slow}_{macd_signal}'
+        
         # Ensure we work on a copy to avoid SettingWithCopyWarning
         data = df.copy()
         
@@ -15,19 +34,19 @@ class TechnicalAnalysisService:
         low = data['low']
 
         # 1. SMA (Simple Moving Average)
-        data['SMA_20'] = close.rolling(window=20).mean()
-        data['SMA_50'] = close.rolling(window=50).mean()
+        data[sma_fast_col] = close.rolling(window=sma_fast).mean()
+        data[sma_slow_col] = close.rolling(window=sma_slow).mean()
         
         # 2. EMA (Exponential Moving Average)
-        data['EMA_20'] = close.ewm(span=20, adjust=False).mean()
+        data[f"EMA_{config['ema']}"] = close.ewm(span=config['ema'], adjust=False).mean()
         
         # 3. RSI (Relative Strength Index)
         delta = close.diff()
         gain = (delta.where(delta > 0, 0))
         loss = (-delta.where(delta < 0, 0))
         
-        avg_gain = gain.rolling(window=14).mean()
-        avg_loss = loss.rolling(window=14).mean()
+        avg_gain = gain.rolling(window=config['rsi']).mean()
+        avg_loss = loss.rolling(window=config['rsi']).mean()
         
         rs = avg_gain / avg_loss
         data['RSI'] = 100 - (100 / (1 + rs))
@@ -36,11 +55,11 @@ class TechnicalAnalysisService:
         # Let's use Wilder's method for consistency with standard libs if possible, but rolling is fine for now to ensure stability.
 
         # 4. MACD (Moving Average Convergence Divergence)
-        exp12 = close.ewm(span=12, adjust=False).mean()
-        exp26 = close.ewm(span=26, adjust=False).mean()
-        data['MACD_12_26_9'] = exp12 - exp26
-        data['MACDs_12_26_9'] = data['MACD_12_26_9'].ewm(span=9, adjust=False).mean() # Signal line
-        data['MACDh_12_26_9'] = data['MACD_12_26_9'] - data['MACDs_12_26_9'] # Histogram
+        exp_fast = close.ewm(span=macd_fast, adjust=False).mean()
+        exp_slow = close.ewm(span=macd_slow, adjust=False).mean()
+        data[f'MACD_{macd_suffix}'] = exp_fast - exp_slow
+        data[f'MACDs_{macd_suffix}'] = data[f'MACD_{macd_suffix}'].ewm(span=macd_signal, adjust=False).mean() # Signal line
+        data[f'MACDh_{macd_suffix}'] = data[f'MACD_{macd_suffix}'] - data[f'MACDs_{macd_suffix}'] # Histogram
 
         # 5. ATR (Average True Range)
         # TR = Max(High - Low, Abs(High - PrevClose), Abs(Low - PrevClose))
@@ -49,27 +68,28 @@ class TechnicalAnalysisService:
         tr2 = (high - prev_close).abs()
         tr3 = (low - prev_close).abs()
         tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        data['ATR'] = tr.rolling(window=14).mean()
+        data['ATR'] = tr.rolling(window=config['atr']).mean()
         
         # Generate Signals (Simple Logic)
         data['Signal'] = 'HOLD'
         
-        # Example Strategy: Golden Cross (SMA 20 crosses above SMA 50)
+        # Example Strategy: Golden Cross (fast SMA crosses above slow SMA)
         # Identify crossover
-        data['Crossover'] = (data['SMA_20'] > data['SMA_50']) & (data['SMA_20'].shift(1) <= data['SMA_50'].shift(1))
-        data['Crossunder'] = (data['SMA_20'] < data['SMA_50']) & (data['SMA_20'].shift(1) >= data['SMA_50'].shift(1))
+        fast, slow = data[sma_fast_col], data[sma_slow_col]
+        data['Crossover'] = (fast > slow) & (fast.shift(1) <= slow.shift(1))
+        data['Crossunder'] = (fast < slow) & (fast.shift(1) >= slow.shift(1))
         
         data.loc[data['Crossover'], 'Signal'] = 'BUY'
         data.loc[data['Crossunder'], 'Signal'] = 'SELL'
         
         # TP/SL Calculation (Based on ATR)
-        # For BUY: SL = Close - 2*ATR, TP = Close + 3*ATR
-        data.loc[data['Signal'] == 'BUY', 'SL'] = data['close'] - (2 * data['ATR'])
-        data.loc[data['Signal'] == 'BUY', 'TP'] = data['close'] + (3 * data['ATR'])
+        # For BUY: SL = Close - sl_atr*ATR, TP = Close + tp_atr*ATR
+        data.loc[data['Signal'] == 'BUY', 'SL'] = data['close'] - (config['sl_atr'] * data['ATR'])
+        data.loc[data['Signal'] == 'BUY', 'TP'] = data['close'] + (config['tp_atr'] * data['ATR'])
         
-        # For SELL: SL = Close + 2*ATR, TP = Close - 3*ATR
-        data.loc[data['Signal'] == 'SELL', 'SL'] = data['close'] + (2 * data['ATR'])
-        data.loc[data['Signal'] == 'SELL', 'TP'] = data['close'] - (3 * data['ATR'])
+        # For SELL: SL = Close + sl_atr*ATR, TP = Close - tp_atr*ATR
+        data.loc[data['Signal'] == 'SELL', 'SL'] = data['close'] + (config['sl_atr'] * data['ATR'])
+        data.loc[data['Signal'] == 'SELL', 'TP'] = data['close'] - (config['tp_atr'] * data['ATR'])
         
         # Clean up intermediate MACD columns to match expected output format if necessary, 
         # or just keep them. The previous code didn't specify exact column names from macd() call 
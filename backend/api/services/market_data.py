@@ -3,63 +3,262 @@ import yfinance as yf
 import pandas as pd
 from datetime import datetime
 import asyncio
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from .mock_data import mock_data_generator
+from .circuit_breaker import CircuitBreaker
 
-class MarketDataService:
-    def __init__(self):
-        self.exchanges = {
-            'binance': ccxt.binance(),
-            'coinbase': ccxt.coinbase(),
+# Errors that mean the upstream is slow, down or throttling us. requests and
+# curl_cffi (used by yfinance) connection errors are OSErrors. Anything else,
+# such as an unknown symbol or no data for a pair, is the request's own error.
+UPSTREAM_ERRORS = (ccxt.NetworkError, OSError, yf.exceptions.YFRateLimitError)
+
+class InvalidMarketRequest(ValueError):
+    """The upstream is healthy but has no data for what was asked"""
+
+def to_yahoo_forex_symbol(pair: str) -> str:
+    """Convert pair format if needed (EUR/USD -> EURUSD=X)"""
+    if '/' in pair:
+        return pair.replace('/', '') + '=X'
+    if not pair.endswith('=X'):
+        return pair + '=X'
+    return pair
+
+def default_sources():
+    """
+    Return (exchanges, yahoo) for the configured MARKET_DATA_BACKEND.
+    `yahoo` is anything with a yfinance-style Ticker(symbol).history(...).
+    """
+    backend = getattr(settings, 'MARKET_DATA_BACKEND', 'live')
+    if backend == 'fake':
+        from .fake_sources import FakeExchange, FakeYahoo
+        options = settings.FAKE_MARKET_DATA
+        exchanges = {
+            'binance': FakeExchange('binance', **options),
+            'coinbase': FakeExchange('coinbase', **options),
         }
+        return exchanges, FakeYahoo(**options)
+    if backend != 'live':
+        raise ImproperlyConfigured(f"Unknown MARKET_DATA_BACKEND: {backend}")
+    exchanges = {
+        'binance': ccxt.binance(),
+        'coinbase': ccxt.coinbase(),
+    }
+    return exchanges, yf
+
+class MarketDataService:
+    # Request keys remembered in the cache and failed set; the least recently used is evicted beyond this
+    max_keys = 1000
+
+    def __init__(self, exchanges=None, yahoo=None):
+        if exchanges is None or yahoo is None:
+            default_exchanges, default_yahoo = default_sources()
+            exchanges = exchanges if exchanges is not None else default_exchanges
+            yahoo = yahoo if yahoo is not None else default_yahoo
+        self.exchanges = exchanges
+        self.yahoo = yahoo
         self.use_mock_data = False  # Flag to control mock data usage
+        
+        # One circuit breaker per upstream so a Binance outage doesn't block Yahoo
+        self.breakers = {name: CircuitBreaker(name) for name in self.exchanges}
+        self.breakers['yahoo'] = CircuitBreaker('yahoo')
+        
+        # Last good candles per request key: key -> (DataFrame, fetched_at epoch seconds),
+        # least recently used first
+        self._last_good = OrderedDict()
+        # Keys being fetched right now: key -> Future resolved when the fetch ends
+        self._in_flight = {}
+        # Keys whose most recent fetch failed: key -> failed_at epoch seconds, oldest first
+        self._failed = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # Cached candles younger than this (seconds) are served as fresh without revalidating
+        self.refresh_after = 10
+        # Older cached candles are served stale while refreshing in the background up
+        # to this age (seconds); past it they are refetched before answering, unless
+        # the upstream is failing
+        self.max_age = 30
+        # How long a cold request waits for someone else's fetch of the same key
+        self.in_flight_timeout = 30
+
+    def _remember(self, lru: OrderedDict, key, value):
+        """Store `value` as the most recent entry of `lru`, evicting beyond max_keys; call with self._lock held"""
+        lru[key] = value
+        lru.move_to_end(key)
+        while len(lru) > self.max_keys:
+            lru.popitem(last=False)
+
+    def _cached(self, key, stale: bool):
+        """Return a copy of the last good candles for `key`, or None"""
+        with self._lock:
+            cached = self._last_good.get(key)
+        if cached is None:
+            return None
+        df, fetched_at = cached
+        df = df.copy()
+        df.attrs['stale'] = stale
+        df.attrs['as_of'] = fetched_at
+        return df
+
+    def _mock(self, fallback):
+        """Generated demo data, marked so it is never presented as live"""
+        df = fallback()
+        df.attrs['mock'] = True
+        df.attrs['stale'] = True
+        return df
+
+    def _start_fetch(self, key) -> Future:
+        """Register a fetch of `key` as in flight; call with self._lock held"""
+        future = self._in_flight[key] = Future()
+        return future
+
+    def _fetch(self, source: str, key, fetch, future: Future):
+        """
+        Run `fetch`, record the outcome on the source's circuit breaker and
+        cache good candles. Resolves `future` with the DataFrame, with None if
+        the upstream failed, or with InvalidMarketRequest for a bad request.
+        Only upstream errors count against the circuit breaker.
+        """
+        breaker = self.breakers[source]
+        result, error = None, None
+        try:
+            df = fetch()
+        except UPSTREAM_ERRORS as e:
+            breaker.record_failure()
+            print(f"⚠️ Error fetching data from {source}: {e}")
+            with self._lock:
+                self._remember(self._failed, key, time.time())
+        except Exception as e:
+            print(f"⚠️ Invalid request to {source} for {key[1]}: {e}")
+            error = InvalidMarketRequest(str(e))
+        else:
+            breaker.record_success()
+            df.attrs['as_of'] = time.time()
+            with self._lock:
+                self._failed.pop(key, None)
+                if not df.empty:
+                    self._remember(self._last_good, key, (df.copy(), df.attrs['as_of']))
+            result = df
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _fetch_with_breaker(self, source: str, key, fetch, fallback):
+        """
+        Stale-while-revalidate through the circuit breaker for `source`.
+        
+        Cached candles younger than `refresh_after` are returned as fresh.
+        Older ones are returned marked stale while a background fetch
+        refreshes them, and past `max_age` they are refetched before
+        answering. While the upstream is failing the cache is served, marked
+        stale, whatever its age. Without cached candles, fetch (or wait for
+        a fetch of the same key already in flight) and only fall back to
+        mock data if that fails or the circuit is open. Raises
+        InvalidMarketRequest if the upstream has no data for the request.
+        """
+        breaker = self.breakers[source]
+        
+        with self._lock:
+            cached = self._last_good.get(key)
+            future = self._in_flight.get(key)
+            failing = key in self._failed or breaker.state != CircuitBreaker.CLOSED
+            owner = wait = False
+            if cached is not None:
+                self._last_good.move_to_end(key)
+                age = time.time() - cached[1]
+                revalidate = age >= self.refresh_after
+                # Too old to serve while the upstream is healthy: answer with the refetch
+                wait = revalidate and age >= self.max_age and not failing
+                if revalidate and future is None and breaker.allow_request():
+                    future = self._start_fetch(key)
+                    owner = wait
+                    if not owner:
+                        threading.Thread(target=self._fetch, args=(source, key, fetch, future), daemon=True).start()
+            else:
+                owner = future is None and breaker.allow_request()
+                if owner:
+                    future = self._start_fetch(key)
+        
+        if cached is not None and not (wait and future is not None):
+            return self._cached(key, stale=failing or revalidate)
+        
+        if future is None:
+            print(f"🔌 {source} circuit open, using mock data for {key[1]}")
+            return self._mock(fallback)
+        
+        if owner:
+            self._fetch(source, key, fetch, future)
+        else:
+            # Another request is already fetching this key: wait for it rather than serving mock data
+            print(f"⏳ Waiting for in-flight fetch of {key[1]}")
+        
+        try:
+            df = future.result(timeout=self.in_flight_timeout)
+        except FutureTimeoutError:
+            df = None
+        if df is None:
+            if cached is not None:
+                return self._cached(key, stale=True)
+            print(f"📊 Using mock data for {key[1]}")
+            return self._mock(fallback)
+        return df if owner else df.copy()
 
     def get_crypto_ohlcv(self, exchange_name: str, symbol: str, timeframe: str = '1h', limit: int = 100):
         exchange = self.exchanges.get(exchange_name)
         if not exchange:
             raise ValueError(f"Exchange {exchange_name} not supported")
         
-        # Try to fetch real data first
-        try:
+        def fetch():
             ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
             df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
             df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
             print(f"✅ Successfully fetched real data for {symbol}")
             return df
-        except Exception as e:
-            print(f"⚠️ Error fetching crypto data from {exchange_name}: {e}")
-            print(f"📊 Using mock data for {symbol}")
-            # Fallback to mock data
-            return mock_data_generator.generate_crypto_ohlcv(symbol, timeframe, limit)
+        
+        # Fallback to mock data
+        return self._fetch_with_breaker(
+            exchange_name,
+            (exchange_name, symbol, timeframe, limit),
+            fetch,
+            lambda: mock_data_generator.generate_crypto_ohlcv(symbol, timeframe, limit),
+        )
 
     def get_stock_ohlcv(self, symbol: str, interval: str = '1h', period: str = '1mo'):
-        try:
-            ticker = yf.Ticker(symbol)
+        def fetch():
+            ticker = self.yahoo.Ticker(symbol)
             df = ticker.history(period=period, interval=interval)
             df.reset_index(inplace=True)
             # Standardize columns
             df.rename(columns={'Date': 'timestamp', 'Datetime': 'timestamp', 'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close', 'Volume': 'volume'}, inplace=True)
             print(f"✅ Successfully fetched stock data for {symbol}")
             return df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
-        except Exception as e:
-            print(f"⚠️ Error fetching stock data: {e}")
-            print(f"📊 Using mock data for {symbol}")
-            # Fallback to mock data (treat as crypto for now)
-            return mock_data_generator.generate_crypto_ohlcv(symbol, interval, 100)
+        
+        # Fallback to mock data (treat as crypto for now)
+        return self._fetch_with_breaker(
+            'yahoo',
+            ('stock', symbol, interval, period),
+            fetch,
+            lambda: mock_data_generator.generate_crypto_ohlcv(symbol, interval, 100),
+        )
 
     def get_forex_ohlcv(self, pair: str, interval: str = '1h', period: str = '1mo'):
         """
         Fetch forex data using yfinance.
         Forex pairs format: EURUSD=X, GBPUSD=X, USDJPY=X, etc.
         """
-        try:
-            # Convert pair format if needed (EUR/USD -> EURUSD=X)
-            yahoo_symbol = pair
-            if '/' in pair:
-                yahoo_symbol = pair.replace('/', '') + '=X'
-            elif not pair.endswith('=X'):
-                yahoo_symbol = pair + '=X'
-            
-            ticker = yf.Ticker(yahoo_symbol)
+        yahoo_symbol = to_yahoo_forex_symbol(pair)
+        
+        def fetch():
+            ticker = self.yahoo.Ticker(yahoo_symbol)
             df = ticker.history(period=period, interval=interval)
             
             if df.empty:
@@ -70,10 +269,13 @@ class MarketDataService:
             df.rename(columns={'Date': 'timestamp', 'Datetime': 'timestamp', 'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close', 'Volume': 'volume'}, inplace=True)
             print(f"✅ Successfully fetched forex data for {pair}")
             return df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
-        except Exception as e:
-            print(f"⚠️ Error fetching forex data: {e}")
-            print(f"📊 Using mock data for {pair}")
-            # Fallback to mock data
-            return mock_data_generator.generate_forex_ohlcv(pair, interval, 100)
+        
+        # Fallback to mock data
+        return self._fetch_with_breaker(
+            'yahoo',
+            ('forex', pair, interval, period),
+            fetch,
+            lambda: mock_data_generator.generate_forex_ohlcv(pair, interval, 100),
+        )
 
 market_data_service = MarketDataService()
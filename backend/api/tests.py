@@ -1,3 +1,340 @@
-from django.test import TestCase
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from . import views
+from .services.backfill import HistoryStore
+from .services.circuit_breaker import CircuitBreaker
+from .services.fake_sources import FakeExchange, FakeYahoo
+from .services.forex_predictor import OnlineForexPredictor
+from .services.indicators import technical_analysis_service
+from .services.market_data import InvalidMarketRequest, MarketDataService
+
+
+def fake_service(latency_ms=0, error_rate=0.0):
+    exchanges = {'binance': FakeExchange('binance', latency_ms=latency_ms, error_rate=error_rate)}
+    return MarketDataService(exchanges, FakeYahoo(latency_ms=latency_ms, error_rate=error_rate))
+
+
+def fake_candles(limit=100, timeframe='1h'):
+    ohlcv = FakeExchange('binance', latency_ms=0).fetch_ohlcv('BTC/USDT', timeframe, limit=limit)
+    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_threshold_and_half_opens_after_cooldown(self):
+        breaker = CircuitBreaker('test', failure_threshold=2, cooldown=0.05)
+        self.assertTrue(breaker.allow_request())
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        time.sleep(0.06)
+        # Exactly one trial request is let through
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, cooldown=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow_request())
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+
+class MarketDataServiceTests(SimpleTestCase):
+    def test_concurrent_cold_fetch_waits_for_in_flight_request(self):
+        service = fake_service(latency_ms=200)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(service.get_crypto_ohlcv('binance', 'BTC/USDT', '1h')))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 3)
+        for df in results:
+            self.assertFalse(df.attrs.get('mock', False))
+            self.assertFalse(df.attrs.get('stale', False))
+            self.assertEqual(df['close'].iloc[-1], results[0]['close'].iloc[-1])
+            self.assertEqual(df['timestamp'].iloc[-1], results[0]['timestamp'].iloc[-1])
+
+    def test_mock_fallback_is_marked(self):
+        service = fake_service(error_rate=1.0)
+        df = service.get_crypto_ohlcv('binance', 'BTC/USDT', '1h')
+        self.assertTrue(df.attrs['mock'])
+        self.assertTrue(df.attrs['stale'])
+
+    def test_bad_symbols_do_not_open_the_circuit(self):
+        service = fake_service()
+        for _ in range(service.breakers['binance'].failure_threshold + 1):
+            with self.assertRaises(InvalidMarketRequest):
+                service.get_crypto_ohlcv('binance', 'NOPE/USDT', '1h')
+            with self.assertRaises(InvalidMarketRequest):
+                service.get_forex_ohlcv('XXX/YYY')
+        self.assertEqual(service.breakers['binance'].state, CircuitBreaker.CLOSED)
+        self.assertEqual(service.breakers['yahoo'].state, CircuitBreaker.CLOSED)
+
+        df = service.get_crypto_ohlcv('binance', 'BTC/USDT', '1h')
+        self.assertFalse(df.attrs.get('mock', False))
+
+    def test_upstream_errors_open_the_circuit(self):
+        service = fake_service(error_rate=1.0)
+        for _ in range(service.breakers['yahoo'].failure_threshold):
+            self.assertTrue(service.get_forex_ohlcv('EUR/USD').attrs['mock'])
+        self.assertEqual(service.breakers['yahoo'].state, CircuitBreaker.OPEN)
+
+    def test_warm_cache_is_served_and_marked_stale_while_failing(self):
+        service = fake_service()
+        fresh = service.get_crypto_ohlcv('binance', 'BTC/USDT', '1h')
+
+        cached = service.get_crypto_ohlcv('binance', 'BTC/USDT', '1h')
+        self.assertFalse(cached.attrs['stale'])
+        self.assertEqual(cached['close'].iloc[-1], fresh['close'].iloc[-1])
+
+        service.exchanges['binance'].simulator.error_rate = 1.0
+        service.refresh_after = 0
+        service.get_crypto_ohlcv('binance', 'BTC/USDT', '1h')
+        # Let the background revalidation fail
+        deadline = time.monotonic() + 2
+        while service._in_flight and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        stale = service.get_crypto_ohlcv('binance', 'BTC/USDT', '1h')
+        self.assertTrue(stale.attrs['stale'])
+        self.assertFalse(stale.attrs.get('mock', False))
+        self.assertEqual(stale['close'].iloc[-1], fresh['close'].iloc[-1])
+
+
+    def age_cache(self, service, seconds):
+        with service._lock:
+            for key, (df, fetched_at) in service._last_good.items():
+                service._last_good[key] = (df, fetched_at - seconds)
+
+    def test_cache_older_than_refresh_after_is_marked_stale(self):
+        service = fake_service()
+        service.get_crypto_ohlcv('binance', 'BTC/USDT', '1h')
+        self.age_cache(service, service.refresh_after)
+
+        df = service.get_crypto_ohlcv('binance', 'BTC/USDT', '1h')
+        self.assertTrue(df.attrs['stale'])
+        self.assertFalse(df.attrs.get('mock', False))
+
+    def test_cache_older_than_max_age_is_refetched_while_healthy(self):
+        service = fake_service()
+        service.get_crypto_ohlcv('binance', 'BTC/USDT', '1h')
+        self.age_cache(service, service.max_age)
+
+        df = service.get_crypto_ohlcv('binance', 'BTC/USDT', '1h')
+        self.assertFalse(df.attrs.get('stale', False))
+        self.assertAlmostEqual(df.attrs['as_of'], time.time(), delta=5)
+
+        # If the refetch fails the old candles are still served, marked stale
+        self.age_cache(service, service.max_age)
+        service.exchanges['binance'].simulator.error_rate = 1.0
+        df = service.get_crypto_ohlcv('binance', 'BTC/USDT', '1h')
+        self.assertTrue(df.attrs['stale'])
+        self.assertFalse(df.attrs.get('mock', False))
+
+
+    def test_cache_and_failed_keys_are_bounded(self):
+        service = fake_service()
+        service.max_keys = 2
+        for symbol in ('BTC/USDT', 'ETH/USDT', 'BTC/USDT', 'SOL/USDT'):
+            service.get_crypto_ohlcv('binance', symbol, '1h')
+        self.assertEqual([key[1] for key in service._last_good], ['BTC/USDT', 'SOL/USDT'])
+
+        service.exchanges['binance'].simulator.error_rate = 1.0
+        for timeframe in ('1m', '5m', '15m'):
+            service.get_crypto_ohlcv('binance', 'ETH/USDT', timeframe)
+        self.assertEqual([key[2] for key in service._failed], ['5m', '15m'])
+
+
+class ConditionalRequestTests(SimpleTestCase):
+    url = '/api/market-analysis/?symbol=BTC/USDT&timeframe=1h'
+    key = ('binance', 'BTC/USDT', '1h', 100)
+
+    def setUp(self):
+        self.service = fake_service()
+        # Keep the cached candles in place for the whole test
+        self.service.refresh_after = 3600
+        patcher = mock.patch.object(views, 'market_data_service', self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_304_until_the_open_candle_changes(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # The open bar ticks: same timestamp, new close
+        df, fetched_at = self.service._last_good[self.key]
+        df.loc[df.index[-1], 'close'] *= 1.05
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_indicator_config_changes_the_response(self):
+        response = self.client.get(self.url)
+        etag, before = response['ETag'], response.json()['data'][-1]
+
+        config = {**technical_analysis_service.config, 'sma': (10, 30), 'atr': 7}
+        with mock.patch.object(technical_analysis_service, 'config', config):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        after = response.json()['data'][-1]
+        self.assertIn('SMA_10', after)
+        self.assertNotIn('SMA_20', after)
+        self.assertNotEqual(after['ATR'], before['ATR'])
+
+    def test_unknown_symbol_is_404(self):
+        response = self.client.get('/api/market-analysis/?symbol=NOPE/USDT&timeframe=1h')
+        self.assertEqual(response.status_code, 404)
+
+    def test_since_returns_only_newer_bars(self):
+        data = self.client.get(self.url).json()['data']
+        since = data[-3]['timestamp']
+
+        delta = self.client.get(f"{self.url}&since={since}").json()['data']
+        self.assertEqual([row['timestamp'] for row in delta], [row['timestamp'] for row in data[-2:]])
+
+
+class ParseSinceTests(SimpleTestCase):
+    def test_formats(self):
+        expected = pd.Timestamp('2024-01-02T03:04:05', tz='UTC')
+        self.assertIsNone(views._parse_since(None))
+        self.assertIsNone(views._parse_since(''))
+        self.assertEqual(views._parse_since('2024-01-02T03:04:05'), expected)
+        self.assertEqual(views._parse_since('2024-01-02T05:04:05+02:00'), expected)
+        self.assertEqual(views._parse_since(str(int(expected.timestamp()))), expected)
+        self.assertEqual(views._parse_since(str(int(expected.timestamp() * 1000))), expected)
+
+    def test_invalid(self):
+        for value in ('yesterday', 'nan'):
+            with self.assertRaises(ValueError):
+                views._parse_since(value)
+
+
+class HistoryStoreTests(SimpleTestCase):
+    step = 60_000
+
+    def frame(self, minutes):
+        return pd.DataFrame({
+            'timestamp': [m * self.step for m in minutes],
+            'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1.0,
+        })
+
+    def test_missing_ranges(self):
+        ranges = HistoryStore.missing_ranges
+        self.assertEqual(ranges(self.frame([]), 0, 9 * self.step, self.step), [(0, 9 * self.step)])
+
+        df = self.frame([2, 3, 6, 7])
+        self.assertEqual(ranges(df, 0, 9 * self.step, self.step), [
+            (0, 1 * self.step),
+            (4 * self.step, 5 * self.step),
+            (8 * self.step, 9 * self.step),
+        ])
+        self.assertEqual(ranges(df, 0, 9 * self.step, self.step, include_gaps=False), [
+            (0, 1 * self.step),
+            (8 * self.step, 9 * self.step),
+        ])
+        self.assertEqual(ranges(self.frame(range(10)), 0, 9 * self.step, self.step), [])
+
+    def test_load_truncates_partial_write_after_checkpoint(self):
+        with tempfile.TemporaryDirectory() as root:
+            store = HistoryStore(root)
+            path = store.path('binance', 'BTC/USDT', '1m')
+            store.append(path, self.frame([0, 1, 2]))
+
+            # Simulate a crash halfway through the next append
+            with open(path, 'a') as f:
+                f.write('180000,1.0,1.')
+
+            df = store.load(path)
+            self.assertEqual(list(df['timestamp']), [0, self.step, 2 * self.step])
+            self.assertEqual(store.checkpoint(path)['last_timestamp'], 2 * self.step)
+            self.assertEqual(Path(path).stat().st_size, store.checkpoint(path)['bytes'])
+
+
+class OnlineForexPredictorTests(SimpleTestCase):
+    def test_labels_only_rows_whose_next_bar_has_closed(self):
+        df = fake_candles()
+        predictor = OnlineForexPredictor()
+        X, _ = predictor.prepare_features(df)
+
+        labelled = predictor.labelled_timestamps(df, X)
+        self.assertEqual(list(labelled.index), list(X.index[:-2]))
+
+        predictor.train_and_predict(df, key='BTC')
+        last_trained = predictor._series['BTC']['last_trained']
+        self.assertEqual(last_trained, pd.Timestamp(df['timestamp'].iloc[-3], tz='UTC'))
+
+        # One more bar closes: exactly one new row is trained
+        newer = pd.concat([df, fake_candles(limit=1, timeframe='1h').assign(
+            timestamp=df['timestamp'].iloc[-1] + pd.Timedelta(hours=1))], ignore_index=True)
+        predictor.train_and_predict(newer, key='BTC')
+        self.assertEqual(predictor._series['BTC']['last_trained'], pd.Timestamp(df['timestamp'].iloc[-2], tz='UTC'))
+
+    def test_mock_and_stale_frames_are_not_trained(self):
+        predictor = OnlineForexPredictor()
+        for flag in ('mock', 'stale'):
+            df = fake_candles()
+            df.attrs[flag] = True
+            self.assertEqual(predictor.train_and_predict(df, key=flag), ("INSUFFICIENT_DATA", 0.0))
+        self.assertEqual(len(predictor._series), 0)
+
+    def test_series_models_are_bounded(self):
+        predictor = OnlineForexPredictor()
+        predictor.max_series = 2
+        df = fake_candles()
+        for key in ('A', 'B', 'A', 'C'):
+            predictor.train_and_predict(df, key=key)
+        self.assertEqual(list(predictor._series), ['A', 'C'])
+
+    def test_confidence_stays_moderate_on_a_random_walk(self):
+        rng = np.random.default_rng(0)
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, 600)))
+        df = pd.DataFrame({
+            'timestamp': pd.date_range('2024-01-01', periods=len(close), freq='h'),
+            'open': close, 'high': close * 1.001, 'low': close * 0.999, 'close': close,
+            'volume': rng.uniform(900, 1100, len(close)),
+        })
+
+        predictor = OnlineForexPredictor()
+        confidences = []
+        # Feed the series one closed bar at a time, like a live poller
+        for end in range(100, len(df) + 1):
+            details = predictor.get_prediction_details(df.iloc[:end], key='walk')
+            confidences.append(details['confidence'])
+
+        # Nothing is predictable here, so the model must not claim STRONG signals
+        self.assertLess(max(confidences), 70)
+        self.assertLess(np.median(confidences), 60)
@@ -1,8 +1,82 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from .services.market_data import market_data_service
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from .services.market_data import market_data_service, InvalidMarketRequest
 from .services.indicators import technical_analysis_service
+import hashlib
 import json
+import pandas as pd
+
+def _parse_since(value):
+    """
+    Parse the ?since= parameter: ISO 8601 or epoch seconds/milliseconds.
+    Returns a UTC pd.Timestamp, or None if the parameter is absent.
+    """
+    if not value:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        ts = pd.Timestamp(value)
+    else:
+        # Treat large numbers as milliseconds (JS Date.now())
+        ts = pd.Timestamp(number, unit='ms' if number > 1e11 else 's')
+    if pd.isna(ts):
+        raise ValueError(f"Invalid timestamp: {value}")
+    if ts.tzinfo is None:
+        return ts.tz_localize('UTC')
+    return ts.tz_convert('UTC')
+
+def _to_utc(timestamps):
+    """Normalize a timestamp column to tz-aware UTC (naive values are assumed UTC)"""
+    timestamps = pd.to_datetime(timestamps)
+    if timestamps.dt.tz is None:
+        return timestamps.dt.tz_localize('UTC')
+    return timestamps.dt.tz_convert('UTC')
+
+def _validators(df, *key_parts):
+    """
+    Build the ETag and Last-Modified value for a response from the
+    latest candle, so an unchanged poll can be answered with a 304
+    before any indicator work or serialization happens.
+    The latest candle is usually still open, so its OHLCV values are part
+    of the ETag, and Last-Modified is when the candles were fetched rather
+    than the bar's open time (None if unknown, e.g. mock data).
+    """
+    last_row = df.iloc[-1]
+    last_candle = _to_utc(df['timestamp'].tail(1)).iloc[0]
+    parts = [str(p) for p in key_parts] + [
+        last_candle.isoformat(),
+        *(repr(float(last_row[col])) for col in ('open', 'high', 'low', 'close', 'volume')),
+        str(len(df)),
+        str(df.attrs.get('stale', False)),
+        str(df.attrs.get('mock', False)),
+        repr(sorted(technical_analysis_service.config.items())),
+    ]
+    digest = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+    as_of = df.attrs.get('as_of')
+    return quote_etag(digest), int(as_of) if as_of is not None else None
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+def _not_modified(request, etag, last_modified):
+    """Return a 304 response if the client's copy is current, else None"""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        _set_validators(response, etag, last_modified)
+    return response
+
+def _since_records(analyzed_df, since):
+    """Serialize the analyzed candles, keeping only bars newer than `since` if given"""
+    if since is not None:
+        analyzed_df = analyzed_df[_to_utc(analyzed_df['timestamp']) > since]
+    # NaN values to None/null
+    return json.loads(analyzed_df.to_json(orient='records', date_format='iso'))
 
 @api_view(['GET'])
 def health_check(request):
@@ -15,11 +89,16 @@ def get_market_analysis(request):
     symbol = request.GET.get('symbol', 'BTC/USDT') # Default crypto
     market_type = request.GET.get('type', 'crypto') # crypto or stock
     timeframe = request.GET.get('timeframe', '1h')
+    # Support basic exchange selection or default to binance
+    exchange = request.GET.get('exchange', 'binance')
+    
+    try:
+        since = _parse_since(request.GET.get('since'))
+    except ValueError:
+        return Response({"error": "Invalid 'since' timestamp"}, status=400)
     
     try:
         if market_type == 'crypto':
-            # Support basic exchange selection or default to binance
-            exchange = request.GET.get('exchange', 'binance')
             df = market_data_service.get_crypto_ohlcv(exchange, symbol, timeframe) 
             # Note: I realized get_crypto_ohlcv was async. 
             # For this simple view, I should probably make it sync or use async view. 
@@ -30,21 +109,33 @@ def get_market_analysis(request):
             
         if df.empty:
              return Response({"error": "No data found"}, status=404)
+        
+        etag, last_modified = _validators(df, 'market', market_type, exchange, symbol, timeframe, since)
+        not_modified = _not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
              
         # Calculate Indicators
         analyzed_df = technical_analysis_service.calculate_indicators(df)
         
         # Convert to JSON compatible format
-        # NaN values to None/null
-        data_json = json.loads(analyzed_df.to_json(orient='records', date_format='iso'))
+        data_json = _since_records(analyzed_df, since)
         
-        return Response({
+        response = Response({
             "symbol": symbol,
             "timeframe": timeframe,
+            "since": since.isoformat() if since is not None else None,
             "data": data_json,
-            "latest_signal": analyzed_df.iloc[-1]['Signal'] if not analyzed_df.empty else "N/A"
+            "latest_signal": analyzed_df.iloc[-1]['Signal'] if not analyzed_df.empty else "N/A",
+            # Set when the upstream is failing and we served cached or mock candles
+            "stale": df.attrs.get('stale', False),
+            "mock": df.attrs.get('mock', False),
+            "as_of": df.attrs.get('as_of')
         })
+        return _set_validators(response, etag, last_modified)
         
+    except InvalidMarketRequest as e:
+        return Response({"error": str(e)}, status=404)
     except Exception as e:
         return Response({"error": str(e)}, status=500)
 
@@ -52,7 +143,8 @@ def get_market_analysis(request):
 def get_forex_prediction(request):
     """
     Get forex prediction with ML model
-    Parameters: pair (e.g., EUR/USD), timeframe (1h, 4h, 1d), period (1mo, 3mo)
+    Parameters: pair (e.g., EUR/USD), timeframe (1h, 4h, 1d), period (1mo, 3mo),
+    since (optional, only return bars newer than this timestamp)
     """
     from .services.forex_predictor import forex_predictor
     
@@ -60,6 +152,11 @@ def get_forex_prediction(request):
     timeframe = request.GET.get('timeframe', '1h')
     period = request.GET.get('period', '1mo')
     
+    try:
+        since = _parse_since(request.GET.get('since'))
+    except ValueError:
+        return Response({"error": "Invalid 'since' timestamp"}, status=400)
+    
     try:
         # Fetch forex data
         df = market_data_service.get_forex_ohlcv(pair, timeframe, period)
@@ -67,23 +164,35 @@ def get_forex_prediction(request):
         if df.empty:
             return Response({"error": "No forex data found for this pair"}, status=404)
         
+        etag, last_modified = _validators(df, 'forex', type(forex_predictor).__name__, pair, timeframe, period, since)
+        not_modified = _not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
         # Get ML prediction
-        prediction_details = forex_predictor.get_prediction_details(df)
+        prediction_details = forex_predictor.get_prediction_details(df, key=(pair, timeframe))
         
         # Calculate technical indicators for additional context
         analyzed_df = technical_analysis_service.calculate_indicators(df)
         
         # Convert to JSON
-        data_json = json.loads(analyzed_df.to_json(orient='records', date_format='iso'))
+        data_json = _since_records(analyzed_df, since)
         
-        return Response({
+        response = Response({
             "pair": pair,
             "timeframe": timeframe,
+            "since": since.isoformat() if since is not None else None,
             "prediction": prediction_details,
             "data": data_json,
-            "technical_signal": analyzed_df.iloc[-1]['Signal'] if not analyzed_df.empty else "N/A"
+            "technical_signal": analyzed_df.iloc[-1]['Signal'] if not analyzed_df.empty else "N/A",
+            "stale": df.attrs.get('stale', False),
+            "mock": df.attrs.get('mock', False),
+            "as_of": df.attrs.get('as_of')
         })
+        return _set_validators(response, etag, last_modified)
         
+    except InvalidMarketRequest as e:
+        return Response({"error": str(e)}, status=404)
     except Exception as e:
         return Response({"error": str(e)}, status=500)
 
@@ -135,6 +135,22 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Local store written by `manage.py backfill`
+HISTORY_DIR = Path(os.environ.get('HISTORY_DIR', BASE_DIR / 'data' / 'history'))
+
+# Market data upstreams: 'live' (ccxt / yfinance) or 'fake' (in-process stand-ins
+# from api/services/fake_sources.py, for offline development and load tests)
+MARKET_DATA_BACKEND = os.environ.get('MARKET_DATA_BACKEND', 'live')
+FAKE_MARKET_DATA = {
+    'latency_ms': float(os.environ.get('FAKE_LATENCY_MS', 50)),
+    'error_rate': float(os.environ.get('FAKE_ERROR_RATE', 0)),
+    'rate_limit': float(os.environ.get('FAKE_RATE_LIMIT', 0)),  # requests/sec per source, 0 = unlimited
+}
+
+# Forex model: 'batch' refits a RandomForest per request, 'online' updates an
+# SGD model per pair incrementally as new bars close
+FOREX_PREDICTOR_BACKEND = os.environ.get('FOREX_PREDICTOR_BACKEND', 'batch')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 